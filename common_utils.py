@@ -1,16 +1,33 @@
-from typing import List, Dict, Any, Union, Callable
+from typing import List, Dict, Any, Union, Callable, Tuple
 from datetime import datetime
 import json
 import logging
 from web3 import Web3
+from eth_abi import encode, decode
+from hexbytes import HexBytes
+from web3.datastructures import AttributeDict
+from functools import lru_cache
+from eth_hash.auto import keccak
+import os
 import re
 import time
+from threading import Lock
 from concurrent.futures import ThreadPoolExecutor, as_completed
+from log_archive import LogArchive
 
 # 配置日志
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# get_logs 返回条数或区块范围超限时的错误关键字，以及不应缩小范围重试的限流错误关键字
+RESULT_LIMIT_ERROR_KEYWORDS = ('more than', 'too many results', 'response size', 'block range', 'range too', 'limit', 'exceed')
+RATE_LIMIT_ERROR_KEYWORDS = ('429', 'too many requests', 'rate limit', 'rate-limit', 'ratelimit', 'max retries', 'timed out', 'connection')
+MAX_BISECT_DEPTH = 10
+
+# 合约部署区块缓存文件
+DEPLOYMENT_BLOCK_CACHE_FILE = "deployment_blocks.json"
+deployment_block_cache_lock = Lock()
+
 def initialize_web3(rpc_url: str) -> Web3:
     """初始化并返回Web3实例。"""
     w3 = Web3(Web3.HTTPProvider(rpc_url))
@@ -21,10 +38,19 @@ def initialize_web3(rpc_url: str) -> Web3:
     logger.info(f"最新区块号: {w3.eth.block_number}")
     return w3
 
-def find_block_by_timestamp(w3: Web3, target_timestamp: float, output_queue: Any) -> int:
-    """使用二分法找到最接近目标时间戳的区块，并记录所花时间和请求次数。"""
-    left = 1
-    right = w3.eth.get_block('latest')['number']
+def find_block_by_timestamp(
+    w3: Web3,
+    target_timestamp: float,
+    output_queue: Any,
+    lower_block: int = 1,
+    upper_block: int = None
+) -> int:
+    """
+    使用二分法在 [lower_block, upper_block] 内找到最接近目标时间戳的区块，并记录所花时间和请求次数。
+    upper_block 默认为最新区块；output_queue 为 None 时不输出耗时。
+    """
+    left = lower_block
+    right = upper_block if upper_block is not None else w3.eth.get_block('latest')['number']
     request_count = 0
     start_time = time.time()
 
@@ -42,10 +68,69 @@ def find_block_by_timestamp(w3: Web3, target_timestamp: float, output_queue: Any
 
     end_time = time.time()
     elapsed_time = end_time - start_time
-    output_queue.put(f"查找区块花费时间: {elapsed_time:.2f}秒，请求次数: {request_count}\n")
+    if output_queue is not None:
+        output_queue.put(f"查找区块花费时间: {elapsed_time:.2f}秒，请求次数: {request_count}\n")
     
     return right if block['timestamp'] != target_timestamp else mid
 
+def load_deployment_block_cache() -> Dict[str, int]:
+    if os.path.exists(DEPLOYMENT_BLOCK_CACHE_FILE):
+        with open(DEPLOYMENT_BLOCK_CACHE_FILE, 'r') as f:
+            return json.load(f)
+    return {}
+
+def find_contract_deployment_block(w3: Web3, contract_address: str, output_queue: Any) -> Union[int, None]:
+    """
+    使用二分法查找合约首次拥有代码的区块（即部署区块），结果按 (链 ID, 合约地址) 缓存到本地文件。
+    需要节点支持历史状态查询；无法确定时返回 None。
+    """
+    cache_key = f"{w3.eth.chain_id}:{Web3.to_checksum_address(contract_address)}"
+    with deployment_block_cache_lock:
+        cache = load_deployment_block_cache()
+    if cache_key in cache:
+        return cache[cache_key]
+
+    left = 0
+    right = w3.eth.block_number
+    request_count = 0
+    start_time = time.time()
+
+    try:
+        if not w3.eth.get_code(contract_address, right):
+            output_queue.put(f"地址 {contract_address} 在最新区块没有合约代码，跳过部署区块查找\n")
+            return None
+
+        while left < right:
+            mid = (left + right) // 2
+            request_count += 1
+            if w3.eth.get_code(contract_address, mid):
+                right = mid
+            else:
+                left = mid + 1
+    except Exception as e:
+        output_queue.put(f"查找合约部署区块时出错（节点可能不支持历史状态查询）: {e}\n")
+        return None
+
+    elapsed_time = time.time() - start_time
+    output_queue.put(f"查找部署区块花费时间: {elapsed_time:.2f}秒，请求次数: {request_count}\n")
+
+    with deployment_block_cache_lock:
+        cache = load_deployment_block_cache()
+        cache[cache_key] = left
+        with open(DEPLOYMENT_BLOCK_CACHE_FILE, 'w') as f:
+            json.dump(cache, f)
+    return left
+
+def find_first_block_after_timestamp(w3: Web3, target_timestamp: int, lower_block: int, upper_block: int) -> int:
+    """
+    在 [lower_block, upper_block] 内找到时间戳不早于目标时间戳的第一个区块。
+    目标区块不在范围内时返回 lower_block（范围内全部不早于目标）或 upper_block + 1（全部早于目标）。
+    """
+    block_number = find_block_by_timestamp(w3, target_timestamp, None, lower_block, upper_block)
+    if w3.eth.get_block(block_number)['timestamp'] < target_timestamp:
+        return block_number + 1
+    return block_number
+
 def get_event_signature(event_abi: Dict) -> str:
     """从事件 ABI 生成事件签名。"""
     if not event_abi or 'name' not in event_abi or 'inputs' not in event_abi:
@@ -56,21 +141,214 @@ def get_event_signature(event_abi: Dict) -> str:
     input_types = ','.join([input.get('type', '') for input in event_abi['inputs']])
     return f"{name}({input_types})"
 
-def process_log(w3: Web3, contract: Any, event_name: str, log: Dict) -> Dict[str, Any]:
-    parsed_log = contract.events[event_name]().process_log(log)
-    tx_hash = log['transactionHash'].hex()
-    tx = w3.eth.get_transaction(tx_hash)
+def fetch_log_context(w3: Web3, log: Dict) -> Dict[str, Any]:
+    """获取日志的补充信息：交易的发送者、接收者以及区块时间戳。"""
+    tx = w3.eth.get_transaction(log['transactionHash'])
     block = w3.eth.get_block(log['blockNumber'])
-    
     return {
-        "交易哈希": tx_hash,
+        "from": tx['from'],
+        "to": tx['to'],
+        "timestamp": block['timestamp']
+    }
+
+def normalize_argument_value(abi_type: str, value: Any) -> Any:
+    """将过滤值转换为与解码后事件参数相同的类型。"""
+    if isinstance(value, str):
+        value = value.strip()
+    if abi_type == 'address':
+        return Web3.to_checksum_address(value)
+    if abi_type.startswith(('uint', 'int')):
+        return int(value, 0) if isinstance(value, str) else int(value)
+    if abi_type == 'bool':
+        return value.lower() in ('true', '1') if isinstance(value, str) else bool(value)
+    if abi_type.startswith('bytes'):
+        return bytes(HexBytes(value))
+    return value
+
+def encode_topic(abi_type: str, value: Any) -> str:
+    """将 indexed 参数值编码为日志 topic。"""
+    if abi_type in ('string', 'bytes'):
+        # 动态类型的 indexed 参数在 topic 中存储的是其 keccak 哈希
+        raw = value.encode('utf-8') if abi_type == 'string' else value
+        return Web3.to_hex(Web3.keccak(raw))
+    if abi_type.endswith(']') or abi_type.startswith('tuple'):
+        raise ValueError(f"不支持按数组或结构体类型的 indexed 参数过滤: {abi_type}")
+    return Web3.to_hex(encode([abi_type], [value]))
+
+def build_argument_filters(
+    event_abi: Dict,
+    event_signature_hash: str,
+    argument_filters: Dict[str, Any]
+) -> Tuple[List[Any], Dict[str, List[Any]]]:
+    """
+    根据事件 ABI 处理参数过滤条件。
+    indexed 参数被编码为 topics[1..3]（多个值为 OR 列表），交给 get_logs 在节点端过滤；
+    返回 (topics, 非 indexed 参数的过滤条件)，后者用于在解码后检查。
+    indexed 参数不在解码后重复检查：动态类型的 indexed 参数解码后只是 topic 哈希，无法与原值比较。
+    """
+    topics = [event_signature_hash]
+    normalized = {}
+    indexed_inputs = [item for item in event_abi['inputs'] if item.get('indexed')]
+    input_types = {item['name']: item['type'] for item in event_abi['inputs']}
+
+    for name, values in (argument_filters or {}).items():
+        if name not in input_types:
+            raise ValueError(f"事件 {event_abi['name']} 没有参数: {name}")
+        if not isinstance(values, (list, tuple, set)):
+            values = [values]
+        if not values:
+            continue
+        normalized[name] = [normalize_argument_value(input_types[name], value) for value in values]
+
+    for position, item in enumerate(indexed_inputs, start=1):
+        if item['name'] in normalized:
+            topics.extend([None] * (position - len(topics)))
+            encoded = [encode_topic(item['type'], value) for value in normalized[item['name']]]
+            topics.append(encoded[0] if len(encoded) == 1 else encoded)
+            del normalized[item['name']]
+
+    return topics, normalized
+
+def compile_topic_filter(topics: List[Any]) -> List[Union[set, None]]:
+    """将 get_logs 的 topics 过滤条件转换为每个位置可接受的 topic 字节集合，None 表示该位置不限制。"""
+    return [
+        None if expected is None
+        else {bytes(HexBytes(topic)) for topic in (expected if isinstance(expected, list) else [expected])}
+        for expected in topics
+    ]
+
+def match_topics(log_topics: List[Any], topic_filter: List[Union[set, None]]) -> bool:
+    """按 get_logs 的 topics 过滤规则检查日志，topic_filter 由 compile_topic_filter 生成。"""
+    if len(log_topics) < len(topic_filter):
+        return False
+    return all(expected is None or bytes(log_topic) in expected
+               for log_topic, expected in zip(log_topics, topic_filter))
+
+@lru_cache(maxsize=65536)
+def checksum_address(address: Union[str, bytes]) -> str:
+    """
+    将 20 字节地址或小写十六进制地址转换为校验和地址（EIP-55）。
+    直接计算哈希以省去 Web3.to_checksum_address 的格式校验开销，并缓存反复出现的地址。
+    """
+    hex_address = address.hex() if isinstance(address, bytes) else address[2:].lower()
+    address_hash = keccak(hex_address.encode('ascii')).hex()
+    return '0x' + ''.join(
+        char.upper() if int(hash_char, 16) >= 8 else char
+        for char, hash_char in zip(hex_address, address_hash)
+    )
+
+def topic_decoder(abi_type: str) -> Callable[[bytes], Any]:
+    """返回单个 indexed 参数 topic 的解码函数，常见类型直接按字节解析，避免 eth_abi 的逐个校验开销。"""
+    if abi_type in ('string', 'bytes') or abi_type.endswith(']') or abi_type.startswith('tuple'):
+        # 动态类型的 indexed 参数在 topic 中只有哈希，无法解码，直接返回 topic 本身
+        return bytes
+    if abi_type == 'address':
+        return lambda topic: checksum_address(bytes(topic[12:]))
+    if abi_type.startswith('uint'):
+        return lambda topic: int.from_bytes(topic, 'big')
+    return lambda topic: decode([abi_type], topic)[0]
+
+def build_args_decoder(event_abi: Dict) -> Callable[[List[bytes], bytes], AttributeDict]:
+    """
+    根据事件 ABI 生成参数解码函数，topics 按类型直接解析，data 用 eth_abi 一次解码，
+    参数顺序和取值与 web3 的 process_log 一致（indexed 参数在前）。
+    """
+    indexed_inputs = [item for item in event_abi['inputs'] if item.get('indexed')]
+    data_inputs = [item for item in event_abi['inputs'] if not item.get('indexed')]
+    data_types = [item['type'] for item in data_inputs]
+    names = [item['name'] for item in indexed_inputs + data_inputs]
+    topic_decoders = [topic_decoder(item['type']) for item in indexed_inputs]
+
+    def decode_args(topics: List[bytes], data: bytes) -> AttributeDict:
+        values = [decode_topic(topic) for decode_topic, topic in zip(topic_decoders, topics[1:])]
+        for abi_type, value in zip(data_types, decode(data_types, data)):
+            if abi_type == 'address':
+                value = checksum_address(value)
+            elif abi_type.startswith('address['):
+                value = [checksum_address(item) for item in value]
+            elif abi_type.endswith(']'):
+                # 与 web3 一致，数组参数返回 list 而不是 tuple
+                value = list(value)
+            values.append(value)
+        return AttributeDict(dict(zip(names, values)))
+
+    return decode_args
+
+def match_event_args(args: Dict[str, Any], argument_filters: Dict[str, List[Any]]) -> bool:
+    """检查解码后的事件参数是否满足所有过滤条件。"""
+    return all(args.get(name) in values for name, values in argument_filters.items())
+
+def format_event_info(log: Dict, parsed_log: Dict, context: Dict[str, Any]) -> Dict[str, Any]:
+    """将解码后的日志与补充信息合并为事件记录。"""
+    return {
+        "交易哈希": log['transactionHash'].hex(),
         "区块号": log['blockNumber'],
-        "时间戳": datetime.fromtimestamp(block['timestamp']),
-        "发送者": tx['from'],
-        "接收者": tx['to'],
+        "时间戳": datetime.fromtimestamp(context['timestamp']),
+        "发送者": context['from'],
+        "接收者": context['to'],
         "事件参数": str(parsed_log['args'])
     }
 
+def process_log(
+    w3: Web3,
+    contract: Any,
+    event_name: str,
+    log: Dict,
+    archive: LogArchive = None,
+    argument_filters: Dict[str, List[Any]] = None,
+    topic_filter: List[Union[set, None]] = None
+) -> Dict[str, Any]:
+    """
+    解码并补充日志信息；不满足 topics 或参数过滤条件时返回 None。
+    提供 archive 时先归档原始日志再解码，解码失败或被过滤的日志也能在之后离线重新处理；
+    否则先解码过滤，被过滤的日志不再请求交易和区块。
+    """
+    context = None
+    if archive is not None:
+        context = fetch_log_context(w3, log)
+        archive.append(log, context)
+
+    if topic_filter is not None and not match_topics(log['topics'], topic_filter):
+        return None
+    parsed_log = contract.events[event_name]().process_log(log)
+    if argument_filters and not match_event_args(parsed_log['args'], argument_filters):
+        return None
+    if context is None:
+        context = fetch_log_context(w3, log)
+    return format_event_info(log, parsed_log, context)
+
+def resolve_block_range(
+    w3: Web3,
+    contract_address: str,
+    start: Union[datetime, int],
+    end: Union[datetime, int],
+    history_type: str,
+    output_queue: Any
+) -> Tuple[int, int]:
+    """将时间范围或区块范围转换为区块范围，并将起始区块裁剪到合约部署区块。"""
+    if history_type == "time":
+        latest_block = w3.eth.get_block('latest')
+        
+        # 使用二分法查找最接近开始时间戳的区块
+        start_block = find_block_by_timestamp(w3, int(start.timestamp()), output_queue)
+
+        if isinstance(end, datetime) and end != datetime.now():
+            # 使用二分法查找最接近结束时间戳的区块
+            end_block = find_block_by_timestamp(w3, int(end.timestamp()), output_queue)
+        else:
+            end_block = latest_block['number']
+    else:
+        start_block = start
+        end_block = end if end != 0 else w3.eth.block_number
+
+    # 合约部署之前不可能有事件，将起始区块裁剪到部署区块
+    deployment_block = find_contract_deployment_block(w3, contract_address, output_queue)
+    if deployment_block is not None and start_block < deployment_block:
+        output_queue.put(f"合约部署于区块 {deployment_block}，起始区块由 {start_block} 调整为 {deployment_block}\n")
+        start_block = deployment_block
+
+    return start_block, end_block
+
 def print_contract_events(
     contract_address: str,
     abi: List[Dict[str, Any]],
@@ -80,10 +358,14 @@ def print_contract_events(
     event_name: str,
     output_queue: Any,
     stop_flag: Callable[[], bool],
-    history_type: str
+    history_type: str,
+    archive: LogArchive = None,
+    argument_filters: Dict[str, Any] = None
 ) -> List[Dict[str, Any]]:
     """
     打印指定范围内合约的特定事件交易数据。
+    如果提供了 archive，原始日志及其补充信息会同时追加到归档中，供之后离线回放。
+    argument_filters 形如 {'from': [地址1, 地址2], 'to': 地址}，indexed 参数在节点端过滤。
     """
     w3 = initialize_web3(rpc_url)
     contract = w3.eth.contract(address=contract_address, abi=abi)
@@ -100,20 +382,14 @@ def print_contract_events(
     output_queue.put(f"事件名称: {event_name}\n")
     output_queue.put(f"事件签名哈希: {event_signature_hash}\n")
 
-    if history_type == "time":
-        latest_block = w3.eth.get_block('latest')
-        
-        # 使用二分法查找最接近开始时间戳的区块
-        start_block = find_block_by_timestamp(w3, int(start.timestamp()), output_queue)
+    try:
+        topics, argument_filters = build_argument_filters(event_abi, event_signature_hash, argument_filters)
+    except ValueError as e:
+        output_queue.put(f"无效的参数过滤条件: {e}\n")
+        return []
+    topic_filter = compile_topic_filter(topics)
 
-        if isinstance(end, datetime) and end != datetime.now():
-            # 使用二分法查找最接近结束时间戳的区块
-            end_block = find_block_by_timestamp(w3, int(end.timestamp()), output_queue)
-        else:
-            end_block = latest_block['number']
-    else:
-        start_block = start
-        end_block = end if end != 0 else w3.eth.block_number
+    start_block, end_block = resolve_block_range(w3, contract_address, start, end, history_type, output_queue)
 
     output_queue.put(f"总区块范围: {start_block} 到 {end_block}\n")
     
@@ -129,20 +405,26 @@ def print_contract_events(
                 logs_filter = {
                     'fromBlock': current_block,
                     'toBlock': batch_end,
-                    'address': contract_address,
-                    'topics': [event_signature_hash]
+                    'address': contract_address
                 }
+                # 归档时获取合约的全部日志，之后可以回放其它事件或使用不同的过滤条件；事件和参数过滤在本地进行
+                if archive is None:
+                    logs_filter['topics'] = topics
                 output_queue.put(f"日志过滤器: {logs_filter}\n")
                 
                 logs = w3.eth.get_logs(logs_filter)
                 output_queue.put(f"事件 {event_name} 在区块 {current_block} 到 {batch_end} 找到 {len(logs)} 条日志\n")
                 
-                futures = [executor.submit(process_log, w3, contract, event_name, log) for log in logs]
+                futures = [executor.submit(process_log, w3, contract, event_name, log, archive, argument_filters, topic_filter) for log in logs]
                 for future in as_completed(futures):
                     if stop_flag():
                         break
                     event_info = future.result()
-                    event_data.append(event_info)
+                    if event_info is not None:
+                        event_data.append(event_info)
+
+                if archive is not None:
+                    archive.flush()
                 
                 if len(event_data) % 100 == 0:  # 每处理100条日志输出一次进度
                     output_queue.put(f"已处理 {len(event_data)} 条事件\n")
@@ -156,13 +438,183 @@ def print_contract_events(
 
     return event_data
 
+def count_logs(w3: Web3, contract_address: str, topics: List[Any], from_block: int, to_block: int) -> int:
+    """只获取区块范围内的日志数量，不做任何解码和补充查询。"""
+    return len(w3.eth.get_logs({
+        'fromBlock': from_block,
+        'toBlock': to_block,
+        'address': contract_address,
+        'topics': topics
+    }))
+
+def is_result_limit_error(error: Exception) -> bool:
+    """判断 get_logs 的错误是否为节点的返回条数或区块范围限制，这类错误缩小区块范围后可以成功。"""
+    # 限流和连接错误缩小范围也无济于事（requests 的异常均继承自 OSError）
+    if isinstance(error, (OSError, TimeoutError)):
+        return False
+    message = str(error).lower()
+    if any(keyword in message for keyword in RATE_LIMIT_ERROR_KEYWORDS):
+        return False
+    return any(keyword in message for keyword in RESULT_LIMIT_ERROR_KEYWORDS)
+
+def count_logs_with_bisect(
+    w3: Web3,
+    contract_address: str,
+    topics: List[Any],
+    from_block: int,
+    to_block: int,
+    output_queue: Any,
+    depth: int = 0
+) -> Tuple[int, bool]:
+    """
+    获取区块范围内的日志数量；因节点返回条数或区块范围限制失败时二分区块范围重试，最多 MAX_BISECT_DEPTH 层。
+    返回 (日志数量, 是否完整)；其它错误（如连接失败、限流）不重试，直接将该范围标记为不完整。
+    """
+    try:
+        return count_logs(w3, contract_address, topics, from_block, to_block), True
+    except Exception as e:
+        if from_block >= to_block or depth >= MAX_BISECT_DEPTH or not is_result_limit_error(e):
+            output_queue.put(f"获取区块 {from_block} 到 {to_block} 的日志数量时出错: {e}\n")
+            return 0, False
+    mid = (from_block + to_block) // 2
+    left_count, left_complete = count_logs_with_bisect(w3, contract_address, topics, from_block, mid, output_queue, depth + 1)
+    right_count, right_complete = count_logs_with_bisect(w3, contract_address, topics, mid + 1, to_block, output_queue, depth + 1)
+    return left_count + right_count, left_complete and right_complete
+
+def count_contract_events(
+    contract_address: str,
+    abi: List[Dict[str, Any]],
+    start: Union[datetime, int],
+    end: Union[datetime, int],
+    rpc_url: str,
+    event_name: str,
+    output_queue: Any,
+    stop_flag: Callable[[], bool],
+    history_type: str,
+    bucket_type: str = "block",
+    bucket_size: int = 10000,
+    argument_filters: Dict[str, Any] = None
+) -> List[Dict[str, Any]]:
+    """
+    统计指定范围内合约特定事件的数量分布，不解码日志也不请求交易和区块信息，各区块段并行获取。
+    bucket_type 为 "block" 时每 bucket_size 个区块为一组，为 "time" 时每 bucket_size 秒为一组。
+    计数模式下只有 indexed 参数的过滤条件生效。
+    获取失败或因停止而未统计的区块段会使所在分组的 "错误" 标记为 True，该分组的事件数不完整。
+    """
+    w3 = initialize_web3(rpc_url)
+
+    event_abi = next((e for e in abi if e['type'] == 'event' and e['name'] == event_name), None)
+    if not event_abi:
+        output_queue.put(f"未找到指定的事件: {event_name}\n")
+        return []
+    event_signature_hash = Web3.to_hex(w3.keccak(text=get_event_signature(event_abi)))
+
+    try:
+        topics, argument_filters = build_argument_filters(event_abi, event_signature_hash, argument_filters)
+    except ValueError as e:
+        output_queue.put(f"无效的参数过滤条件: {e}\n")
+        return []
+    if argument_filters:
+        output_queue.put(f"计数模式不解码日志，忽略非 indexed 参数的过滤条件: {', '.join(argument_filters)}\n")
+
+    start_block, end_block = resolve_block_range(w3, contract_address, start, end, history_type, output_queue)
+    output_queue.put(f"总区块范围: {start_block} 到 {end_block}\n")
+
+    start_time = time.time()
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        if bucket_type == "time":
+            start_block_timestamp = w3.eth.get_block(start_block)['timestamp']
+            end_block_timestamp = w3.eth.get_block(end_block)['timestamp']
+            if history_type == "time":
+                start_timestamp = int(start.timestamp())
+                end_timestamp = int(end.timestamp())
+            else:
+                start_timestamp = start_block_timestamp
+                end_timestamp = end_block_timestamp
+
+            bucket_timestamps = list(range(start_timestamp, max(end_timestamp, start_timestamp + 1), bucket_size))
+            blocks_per_second = (end_block - start_block) / max(end_block_timestamp - start_block_timestamp, 1)
+            margin = max(int(bucket_size * blocks_per_second) // 10, 100)
+
+            def find_boundary(timestamp: int) -> int:
+                if timestamp <= start_block_timestamp:
+                    return start_block
+                if timestamp > end_block_timestamp:
+                    return end_block + 1
+                # 按平均出块速度估计分组起点附近的窗口，结果落在窗口边缘说明估计不准，退回整个扫描范围
+                guess = start_block + int((timestamp - start_block_timestamp) * blocks_per_second)
+                lower = max(start_block, guess - margin)
+                upper = min(end_block, guess + margin)
+                block_number = find_first_block_after_timestamp(w3, timestamp, lower, upper)
+                if lower < block_number <= upper:
+                    return block_number
+                return find_first_block_after_timestamp(w3, timestamp, start_block, end_block)
+
+            # 通过时间戳二分查找将每个时间分组的起点映射为区块号
+            boundary_start_time = time.time()
+            boundary_blocks = list(executor.map(find_boundary, bucket_timestamps[1:]))
+            output_queue.put(f"分组边界查找花费时间: {time.time() - boundary_start_time:.2f}秒\n")
+            bucket_starts = [start_block] + [max(block, start_block) for block in boundary_blocks]
+            bucket_ends = [min(block - 1, end_block) for block in boundary_blocks] + [end_block]
+            labels = [datetime.fromtimestamp(timestamp).strftime('%Y-%m-%d %H:%M') for timestamp in bucket_timestamps]
+        else:
+            bucket_starts = list(range(start_block, end_block + 1, bucket_size))
+            bucket_ends = [min(block + bucket_size - 1, end_block) for block in bucket_starts]
+            labels = [f"{block_start}-{block_end}" for block_start, block_end in zip(bucket_starts, bucket_ends)]
+
+        histogram = [
+            {"区间": label, "开始区块": block_start, "结束区块": block_end, "事件数": 0, "错误": False}
+            for label, block_start, block_end in zip(labels, bucket_starts, bucket_ends)
+        ]
+
+        futures = {}
+        for index, bucket in enumerate(histogram):
+            for chunk_start in range(bucket["开始区块"], bucket["结束区块"] + 1, 1000):
+                chunk_end = min(chunk_start + 999, bucket["结束区块"])
+                futures[executor.submit(count_logs_with_bisect, w3, contract_address, topics, chunk_start, chunk_end, output_queue)] = index
+        output_queue.put(f"共 {len(histogram)} 个分组，{len(futures)} 个区块段\n")
+
+        stopped = False
+        consumed = set()
+        for completed, future in enumerate(as_completed(futures), start=1):
+            if stop_flag():
+                stopped = True
+                for pending in futures:
+                    pending.cancel()
+                break
+            consumed.add(future)
+            bucket = histogram[futures[future]]
+            count, complete = future.result()
+            bucket["事件数"] += count
+            if not complete:
+                bucket["错误"] = True
+                output_queue.put(f"分组 {bucket['区间']} 统计不完整\n")
+            if completed % 100 == 0:
+                output_queue.put(f"已完成 {completed}/{len(futures)} 个区块段\n")
+
+    if stopped:
+        # 被取消或未读取结果的区块段没有计入，对应分组不完整
+        for future, index in futures.items():
+            if future not in consumed:
+                histogram[index]["错误"] = True
+
+    total = sum(bucket["事件数"] for bucket in histogram)
+    status = "统计已停止，结果不完整" if stopped else "统计完成"
+    output_queue.put(f"{status}，共 {total} 条事件，耗时 {time.time() - start_time:.2f}秒\n")
+    incomplete = sum(1 for bucket in histogram if bucket["错误"])
+    if incomplete:
+        output_queue.put(f"警告: {incomplete} 个分组存在获取失败的区块段，统计结果不完整\n")
+    return histogram
+
 def monitor_new_events(
     contract_address: str,
     abi: List[Dict[str, Any]],
     rpc_url: str,
     event_name: str,
     output_queue: Any,
-    stop_flag: Callable[[], bool]
+    stop_flag: Callable[[], bool],
+    archive: LogArchive = None,
+    argument_filters: Dict[str, Any] = None
 ) -> List[Dict[str, Any]]:
     """
     持续监听并打印新的合约事件。
@@ -187,6 +639,13 @@ def monitor_new_events(
     if not event_signature_hash.startswith('0x'):
         event_signature_hash = '0x' + event_signature_hash
     output_queue.put(f'event_signature_hash: {event_signature_hash}\n')
+
+    try:
+        topics, argument_filters = build_argument_filters(event_abi, event_signature_hash, argument_filters)
+    except ValueError as e:
+        output_queue.put(f"无效的参数过滤条件: {e}\n")
+        return []
+    topic_filter = compile_topic_filter(topics)
     
     latest_block = w3.eth.get_block('latest')
     from_block = latest_block['number']
@@ -195,38 +654,31 @@ def monitor_new_events(
 
     new_events = []
     try:
-        logs = w3.eth.get_logs({
+        logs_filter = {
             'fromBlock': from_block,
             'toBlock': 'latest',
-            'address': contract_address,
-            'topics': [event_signature_hash]
-        })
+            'address': contract_address
+        }
+        # 归档时获取合约的全部日志，之后可以回放其它事件或使用不同的过滤条件；事件和参数过滤在本地进行
+        if archive is None:
+            logs_filter['topics'] = topics
+        logs = w3.eth.get_logs(logs_filter)
 
         for log in logs:
             if stop_flag():
                 break
             try:
-                parsed_log = contract.events[event_name]().process_log(log)
-                tx_hash = log['transactionHash'].hex()
-                tx = w3.eth.get_transaction(tx_hash)
-                block = w3.eth.get_block(log['blockNumber'])
-                
-                event_info = {
-                    "交易哈希": tx_hash,
-                    "区块号": log['blockNumber'],
-                    "时间戳": datetime.fromtimestamp(block['timestamp']),
-                    "发送者": tx['from'],
-                    "接收者": tx['to'],
-                    "事件参数": str(parsed_log['args'])
-                }
+                event_info = process_log(w3, contract, event_name, log, archive, argument_filters, topic_filter)
+                if event_info is None:
+                    continue
                 new_events.append(event_info)
                 
-                output_queue.put(f"新事件 - 交易哈希: {tx_hash}\n")
-                output_queue.put(f"区块号: {log['blockNumber']}\n")
+                output_queue.put(f"新事件 - 交易哈希: {event_info['交易哈希']}\n")
+                output_queue.put(f"区块号: {event_info['区块号']}\n")
                 output_queue.put(f"时间戳: {event_info['时间戳']}\n")
-                output_queue.put(f"发送者: {tx['from']}\n")
-                output_queue.put(f"接收者: {tx['to']}\n")
-                output_queue.put(f"事件参数: {parsed_log['args']}\n")
+                output_queue.put(f"发送者: {event_info['发送者']}\n")
+                output_queue.put(f"接收者: {event_info['接收者']}\n")
+                output_queue.put(f"事件参数: {event_info['事件参数']}\n")
                 output_queue.put("---\n")
             except Exception as e:
                 output_queue.put(f"处理新日志时出错: {e}\n")
@@ -234,9 +686,95 @@ def monitor_new_events(
     except Exception as e:
         output_queue.put(f"获取新日志时出错: {e}\n")
 
+    if archive is not None:
+        archive.flush()
+
     output_queue.put(f"返回 {len(new_events)} 个新事件\n")
     return new_events
 
+def replay_events(
+    archive_dir: str,
+    contract_address: str,
+    abi: List[Dict[str, Any]],
+    start: Union[datetime, int],
+    end: Union[datetime, int],
+    event_name: str,
+    output_queue: Any,
+    stop_flag: Callable[[], bool],
+    history_type: str,
+    argument_filters: Dict[str, Any] = None
+) -> List[Dict[str, Any]]:
+    """
+    从本地归档回放指定范围内合约的特定事件，不发起任何 RPC 请求。
+    返回的事件记录与 print_contract_events 的格式相同。
+    """
+    contract_address = Web3.to_checksum_address(contract_address)
+
+    event_abi = next((e for e in abi if e['type'] == 'event' and e['name'] == event_name), None)
+    if not event_abi:
+        output_queue.put(f"未找到指定的事件: {event_name}\n")
+        return []
+    event_signature_hash = Web3.keccak(text=get_event_signature(event_abi))
+    decode_args = build_args_decoder(event_abi)
+
+    try:
+        topics, argument_filters = build_argument_filters(event_abi, Web3.to_hex(event_signature_hash), argument_filters)
+    except ValueError as e:
+        output_queue.put(f"无效的参数过滤条件: {e}\n")
+        return []
+    topic_filter = compile_topic_filter(topics)
+
+    if history_type == "time":
+        start_block, end_block = 0, 0
+        start_timestamp = int(start.timestamp())
+        end_timestamp = int(end.timestamp())
+        output_queue.put(f"回放时间范围: {start} 到 {end}\n")
+    else:
+        start_block, end_block = start, end
+        start_timestamp = end_timestamp = None
+        output_queue.put(f"回放区块范围: {start_block} 到 {end_block or '归档末尾'}\n")
+
+    archive = LogArchive(archive_dir)
+    if contract_address not in archive.addresses():
+        output_queue.put(f"警告: 归档中没有合约 {contract_address} 的日志\n")
+    start_time = time.time()
+    event_data = []
+    records = archive.iter_records(start_block, end_block, start_timestamp, end_timestamp,
+                                   contract_address, event_signature_hash, raw=True)
+    for log, context in records:
+        if stop_flag():
+            break
+        # 归档中没有节点端过滤，indexed 参数的过滤条件在这里按 topics 检查
+        if not match_topics(log['topics'], topic_filter):
+            continue
+        try:
+            args = decode_args(log['topics'], log['data'])
+            if argument_filters and not match_event_args(args, argument_filters):
+                continue
+            log['transactionHash'] = HexBytes(log['transactionHash'])
+            context['from'] = checksum_address(context['from'])
+            context['to'] = checksum_address(context['to']) if context['to'] else None
+            event_data.append(format_event_info(log, {'args': args}, context))
+            if len(event_data) % 10000 == 0:
+                output_queue.put(f"已回放 {len(event_data)} 条事件\n")
+        except Exception as e:
+            output_queue.put(f"解码归档日志时出错: {e}\n")
+
+    output_queue.put(f"回放完成，共 {len(event_data)} 条事件，耗时 {time.time() - start_time:.2f}秒\n")
+    return event_data
+
+def parse_argument_filters(filter_str: str) -> Dict[str, List[str]]:
+    """解析参数过滤字符串，例如 "from=0xabc,0xdef; to=0x123"，返回 {参数名: [值, ...]}"""
+    argument_filters = {}
+    for item in filter_str.split(';'):
+        if not item.strip():
+            continue
+        if '=' not in item:
+            raise ValueError(f"无效的过滤条件: {item.strip()}")
+        name, values = item.split('=', 1)
+        argument_filters[name.strip()] = [value.strip() for value in values.split(',') if value.strip()]
+    return argument_filters
+
 def parse_attribute_dict(args_str):
     """解析 AttributeDict 字符串，返回解析后的字典"""
     pattern = r"AttributeDict\({(.+?)}\)"
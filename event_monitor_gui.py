@@ -11,7 +11,8 @@ from threading import Lock
 import traceback
 import time
 import re
-from common_utils import initialize_web3, print_contract_events, monitor_new_events, parse_attribute_dict
+from common_utils import initialize_web3, print_contract_events, monitor_new_events, replay_events, count_contract_events, parse_argument_filters, parse_attribute_dict
+from log_archive import LogArchive
 
 class EventMonitorGUI:
     def __init__(self, master):
@@ -62,7 +63,12 @@ class EventMonitorGUI:
             'start_time': self.start_time_entry.get(),
             'end_time': self.end_time_entry.get() or '0',
             'start_block': self.start_block_entry.get(),
-            'end_block': self.end_block_entry.get() or '0'
+            'end_block': self.end_block_entry.get() or '0',
+            'archive_enabled': self.archive_var.get(),
+            'archive_dir': self.archive_dir_entry.get(),
+            'argument_filters': self.argument_filter_entry.get(),
+            'bucket_type': self.bucket_type_var.get(),
+            'bucket_size': self.bucket_size_entry.get() or '10000'
         }
         with open(self.config_file, 'w') as f:
             json.dump(current_config, f)
@@ -92,6 +98,11 @@ class EventMonitorGUI:
             self.end_time_entry.insert(0, self.last_config.get('end_time', '0'))
             self.start_block_entry.insert(0, self.last_config.get('start_block', ''))
             self.end_block_entry.insert(0, self.last_config.get('end_block', '0'))
+            self.archive_var.set(self.last_config.get('archive_enabled', False))
+            self.archive_dir_entry.insert(0, self.last_config.get('archive_dir', ''))
+            self.argument_filter_entry.insert(0, self.last_config.get('argument_filters', ''))
+            self.bucket_type_var.set(self.last_config.get('bucket_type', 'time'))
+            self.bucket_size_entry.insert(0, self.last_config.get('bucket_size', '10000'))
 
     def on_closing(self):
         self.save_current_config()
@@ -145,8 +156,11 @@ class EventMonitorGUI:
         # 模式选择
         ttk.Label(frame, text="模式:").grid(row=6, column=0, sticky=tk.W, padx=5, pady=5)
         self.mode_var = tk.StringVar(value="live")
-        ttk.Radiobutton(frame, text="历史模式", variable=self.mode_var, value="history", command=self.toggle_history_mode).grid(row=6, column=1, sticky=tk.W, padx=5, pady=5)
-        ttk.Radiobutton(frame, text="实时监听", variable=self.mode_var, value="live", command=self.toggle_history_mode).grid(row=6, column=2, sticky=tk.W, padx=5, pady=5)
+        mode_frame = ttk.Frame(frame)
+        mode_frame.grid(row=6, column=1, columnspan=2, sticky=tk.W)
+        ttk.Radiobutton(mode_frame, text="历史模式", variable=self.mode_var, value="history", command=self.toggle_history_mode).pack(side=tk.LEFT, padx=5, pady=5)
+        ttk.Radiobutton(mode_frame, text="实时监听", variable=self.mode_var, value="live", command=self.toggle_history_mode).pack(side=tk.LEFT, padx=5, pady=5)
+        ttk.Radiobutton(mode_frame, text="归档回放", variable=self.mode_var, value="replay", command=self.toggle_history_mode).pack(side=tk.LEFT, padx=5, pady=5)
 
         # 历史模式选项
         self.history_frame = ttk.Frame(frame)
@@ -182,17 +196,48 @@ class EventMonitorGUI:
         self.end_block_entry = ttk.Entry(self.block_frame, width=20)
         self.end_block_entry.grid(row=1, column=1, padx=5, pady=5)
 
+        # 事件数量分布统计（只计数，不解码）
+        self.histogram_frame = ttk.Frame(self.history_frame)
+        self.histogram_frame.grid(row=2, column=0, columnspan=2, padx=5, pady=5)
+
+        ttk.Label(self.histogram_frame, text="分组方式:").grid(row=0, column=0, sticky=tk.W, padx=5, pady=5)
+        self.bucket_type_var = tk.StringVar(value="time")
+        ttk.Radiobutton(self.histogram_frame, text="按天", variable=self.bucket_type_var, value="time").grid(row=0, column=1, sticky=tk.W, padx=5, pady=5)
+        ttk.Radiobutton(self.histogram_frame, text="按区块数", variable=self.bucket_type_var, value="block").grid(row=0, column=2, sticky=tk.W, padx=5, pady=5)
+        self.bucket_size_entry = ttk.Entry(self.histogram_frame, width=10)
+        self.bucket_size_entry.grid(row=0, column=3, padx=5, pady=5)
+        self.histogram_button = ttk.Button(self.histogram_frame, text="统计事件分布", command=self.start_histogram)
+        self.histogram_button.grid(row=0, column=4, padx=5, pady=5)
+
+        # 原始日志归档
+        archive_frame = ttk.Frame(frame)
+        archive_frame.grid(row=8, column=0, columnspan=3, padx=5, pady=5)
+        self.archive_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(archive_frame, text="归档原始日志", variable=self.archive_var).pack(side=tk.LEFT, padx=5)
+        ttk.Label(archive_frame, text="归档目录:").pack(side=tk.LEFT, padx=5)
+        self.archive_dir_entry = ttk.Entry(archive_frame, width=25)
+        self.archive_dir_entry.pack(side=tk.LEFT, padx=5)
+        ttk.Button(archive_frame, text="浏览", command=self.browse_archive_dir).pack(side=tk.LEFT, padx=5)
+
+        # 事件参数过滤
+        ttk.Label(frame, text="参数过滤:").grid(row=9, column=0, sticky=tk.W, padx=5, pady=5)
+        filter_frame = ttk.Frame(frame)
+        filter_frame.grid(row=9, column=1, columnspan=2, padx=5, pady=5)
+        self.argument_filter_entry = ttk.Entry(filter_frame, width=50)
+        self.argument_filter_entry.pack(side=tk.TOP)
+        ttk.Label(filter_frame, text="例如: from=0x...,0x...; to=0x...").pack(side=tk.TOP, anchor=tk.W)
+
         # 开始按钮
         self.start_button = ttk.Button(frame, text="开始监听", command=self.start_monitoring)
-        self.start_button.grid(row=9, column=0, columnspan=3, pady=10)
+        self.start_button.grid(row=10, column=0, columnspan=3, pady=10)
 
         # 停止按钮
         self.stop_button = ttk.Button(frame, text="停止监听", command=self.stop_monitoring_thread, state="disabled")
-        self.stop_button.grid(row=10, column=0, columnspan=3, pady=10)
+        self.stop_button.grid(row=11, column=0, columnspan=3, pady=10)
 
         # 输出文本框和滚动条
         output_frame = ttk.Frame(frame)
-        output_frame.grid(row=11, column=0, columnspan=3, padx=5, pady=5, sticky=(tk.W, tk.E, tk.N, tk.S))
+        output_frame.grid(row=12, column=0, columnspan=3, padx=5, pady=5, sticky=(tk.W, tk.E, tk.N, tk.S))
         output_frame.columnconfigure(0, weight=1)
         output_frame.rowconfigure(0, weight=1)
 
@@ -209,11 +254,11 @@ class EventMonitorGUI:
 
         # 添加存按钮
         self.save_button = ttk.Button(frame, text="保存到CSV", command=self.save_to_csv, state="disabled")
-        self.save_button.grid(row=12, column=0, columnspan=3, pady=10)
+        self.save_button.grid(row=13, column=0, columnspan=3, pady=10)
 
         # 添加测试按钮
         self.test_button = ttk.Button(frame, text="填充测试数据", command=self.fill_test_data)
-        self.test_button.grid(row=13, column=0, columnspan=3, pady=10)
+        self.test_button.grid(row=14, column=0, columnspan=3, pady=10)
 
     def toggle_abi_input(self):
         if self.abi_input_var.get() == "file":
@@ -229,6 +274,12 @@ class EventMonitorGUI:
             self.abi_path_entry.delete(0, tk.END)
             self.abi_path_entry.insert(0, filename)
 
+    def browse_archive_dir(self):
+        directory = filedialog.askdirectory()
+        if directory:
+            self.archive_dir_entry.delete(0, tk.END)
+            self.archive_dir_entry.insert(0, directory)
+
     def get_abi(self):
         if self.abi_input_var.get() == "file":
             abi_path = self.abi_path_entry.get().strip()
@@ -250,7 +301,7 @@ class EventMonitorGUI:
                 return None
 
     def toggle_history_mode(self):
-        if self.mode_var.get() == "history":
+        if self.mode_var.get() in ("history", "replay"):
             self.history_frame.grid()
         else:
             self.history_frame.grid_remove()
@@ -263,7 +314,10 @@ class EventMonitorGUI:
             self.time_frame.grid_remove()
             self.block_frame.grid()
 
-    def start_monitoring(self):
+    def start_histogram(self):
+        self.start_monitoring(histogram=True)
+
+    def start_monitoring(self, histogram=False):
         contract_address = self.contract_address_entry.get().strip()
         try:
             contract_address = Web3.to_checksum_address(contract_address)
@@ -274,56 +328,86 @@ class EventMonitorGUI:
         abi = self.get_abi()
         event_name = self.event_name_entry.get().strip()
         rpc_url = self.rpc_url_entry.get().strip()
-        mode = self.mode_var.get()
+        mode = "history" if histogram else self.mode_var.get()
 
-        if not all([contract_address, abi, event_name, rpc_url]):
+        if not all([contract_address, abi, event_name]) or (mode != "replay" and not rpc_url):
             messagebox.showerror("错误", "请填写所有必要的信息")
             return
 
-        self.stop_monitoring.clear()
-        self.start_button.config(state="disabled")
-        self.stop_button.config(state="normal")
-        self.event_data = []
-        self.save_button.config(state="disabled")
+        archive_dir = self.archive_dir_entry.get().strip()
+        if (mode == "replay" or (self.archive_var.get() and not histogram)) and not archive_dir:
+            messagebox.showerror("错误", "请选择归档目录")
+            return
+        try:
+            argument_filters = parse_argument_filters(self.argument_filter_entry.get())
+        except ValueError as e:
+            messagebox.showerror("错误", str(e))
+            return
 
-        self.output_text.delete(1.0, tk.END)
-        self.last_update_time = 0
-        self.master.after(self.update_interval, self.update_output)
+        if histogram:
+            try:
+                bucket_size = int(self.bucket_size_entry.get().strip()) if self.bucket_type_var.get() == "block" else 86400
+                if bucket_size <= 0:
+                    raise ValueError
+            except ValueError:
+                messagebox.showerror("错误", "请输入有效的分组区块数")
+                return
 
-        if mode == "history":
+        if mode in ("history", "replay"):
             history_type = self.history_type_var.get()
             if history_type == "time":
                 try:
-                    start_time = datetime.strptime(self.start_time_entry.get().strip(), '%Y-%m-%d')
+                    start = datetime.strptime(self.start_time_entry.get().strip(), '%Y-%m-%d')
                     end_time_str = self.end_time_entry.get().strip()
                     if end_time_str == '0':
-                        end_time = datetime.now()
-                        self.output_queue.put(f"使用当前时间作为结束时间: {end_time}\n")
+                        end = datetime.now()
+                        self.output_queue.put(f"使用当前时间作为结束时间: {end}\n")
                     else:
-                        end_time = datetime.strptime(end_time_str, '%Y-%m-%d')
+                        end = datetime.strptime(end_time_str, '%Y-%m-%d')
                 except ValueError:
                     messagebox.showerror("错误", "请输入有效的日期格式 (YYYY-MM-DD)")
                     return
-                self.monitoring_thread = threading.Thread(target=self.run_history_mode, 
-                                                          args=(contract_address, abi, start_time, end_time, rpc_url, event_name, "time"))
             else:
                 try:
-                    start_block = int(self.start_block_entry.get().strip())
+                    start = int(self.start_block_entry.get().strip())
                     end_block_str = self.end_block_entry.get().strip()
-                    if end_block_str == '0':
+                    if end_block_str == '0' and mode == "replay":
+                        end = 0
+                    elif end_block_str == '0':
                         w3 = Web3(Web3.HTTPProvider(rpc_url))
-                        end_block = w3.eth.get_block('latest')['number']
-                        self.output_queue.put(f"使用最新区块作为结束区块: {end_block}\n")
+                        end = w3.eth.get_block('latest')['number']
+                        self.output_queue.put(f"使用最新区块作为结束区块: {end}\n")
                     else:
-                        end_block = int(end_block_str)
+                        end = int(end_block_str)
                 except ValueError:
                     messagebox.showerror("错误", "请输入有效的区块号")
                     return
-                self.monitoring_thread = threading.Thread(target=self.run_history_mode, 
-                                                          args=(contract_address, abi, start_block, end_block, rpc_url, event_name, "block"))
+
+        # 所有输入校验通过后才修改按钮状态和创建归档，避免校验失败时按钮保持禁用或遗留打开的文件
+        self.stop_monitoring.clear()
+        self.start_button.config(state="disabled")
+        self.histogram_button.config(state="disabled")
+        self.stop_button.config(state="normal")
+        self.event_data = []
+        self.save_button.config(state="disabled")
+
+        self.output_text.delete(1.0, tk.END)
+        self.last_update_time = 0
+        self.master.after(self.update_interval, self.update_output)
+
+        archive = LogArchive(archive_dir) if not histogram and mode != "replay" and self.archive_var.get() else None
+        if histogram:
+            self.monitoring_thread = threading.Thread(target=self.run_histogram_mode, 
+                                                      args=(contract_address, abi, start, end, rpc_url, event_name, history_type, self.bucket_type_var.get(), bucket_size, argument_filters))
+        elif mode == "replay":
+            self.monitoring_thread = threading.Thread(target=self.run_replay_mode, 
+                                                      args=(archive_dir, contract_address, abi, start, end, event_name, history_type, argument_filters))
+        elif mode == "history":
+            self.monitoring_thread = threading.Thread(target=self.run_history_mode, 
+                                                      args=(contract_address, abi, start, end, rpc_url, event_name, history_type, archive, argument_filters))
         else:
             self.monitoring_thread = threading.Thread(target=self.run_live_mode, 
-                                                      args=(contract_address, abi, rpc_url, event_name))
+                                                      args=(contract_address, abi, rpc_url, event_name, archive, argument_filters))
 
         self.monitoring_thread.start()
 
@@ -339,9 +423,11 @@ class EventMonitorGUI:
         if not self.stop_monitoring.is_set():
             self.master.after(100, self.update_output)
 
-    def run_history_mode(self, contract_address, abi, start, end, rpc_url, event_name, history_type):
+    def run_history_mode(self, contract_address, abi, start, end, rpc_url, event_name, history_type, archive=None, argument_filters=None):
         self.output_queue.put("开始历史模式监听...\n")
-        events = print_contract_events(contract_address, abi, start, end, rpc_url, event_name, self.output_queue, self.stop_monitoring.is_set, history_type)
+        events = print_contract_events(contract_address, abi, start, end, rpc_url, event_name, self.output_queue, self.stop_monitoring.is_set, history_type, archive, argument_filters)
+        if archive is not None:
+            archive.close()
         with self.event_data_lock:
             self.event_data.extend(events)
         self.output_queue.put(f"历史模式监听完成，找到 {len(events)} 个事件\n")
@@ -350,19 +436,72 @@ class EventMonitorGUI:
         # 停止监听，但不退出 UI
         self.stop_monitoring_thread()
 
-    def run_live_mode(self, contract_address, abi, rpc_url, event_name):
+    def run_live_mode(self, contract_address, abi, rpc_url, event_name, archive=None, argument_filters=None):
         self.output_queue.put("开始实时监听...\n")
         while not self.stop_monitoring.is_set():
-            new_events = monitor_new_events(contract_address, abi, rpc_url, event_name, self.output_queue, self.stop_monitoring.is_set)
+            new_events = monitor_new_events(contract_address, abi, rpc_url, event_name, self.output_queue, self.stop_monitoring.is_set, archive, argument_filters)
             if new_events:
                 with self.event_data_lock:
                     self.event_data.extend(new_events)
                     self.output_queue.put(f"新增 {len(new_events)} 个事件，总事件数：{len(self.event_data)}\n")
             time.sleep(1)
+        if archive is not None:
+            archive.close()
+
+    def run_replay_mode(self, archive_dir, contract_address, abi, start, end, event_name, history_type, argument_filters=None):
+        self.output_queue.put("开始归档回放...\n")
+        events = replay_events(archive_dir, contract_address, abi, start, end, event_name, self.output_queue, self.stop_monitoring.is_set, history_type, argument_filters)
+        with self.event_data_lock:
+            self.event_data.extend(events)
+        self.output_queue.put(f"归档回放完成，找到 {len(events)} 个事件\n")
+
+        # 停止回放，但不退出 UI
+        self.stop_monitoring_thread()
+
+    def run_histogram_mode(self, contract_address, abi, start, end, rpc_url, event_name, history_type, bucket_type, bucket_size, argument_filters=None):
+        self.output_queue.put("开始统计事件分布...\n")
+        histogram = count_contract_events(contract_address, abi, start, end, rpc_url, event_name, self.output_queue, self.stop_monitoring.is_set, history_type, bucket_type, bucket_size, argument_filters)
+        for bucket in histogram:
+            incomplete = " (不完整)" if bucket["错误"] else ""
+            self.output_queue.put(f"{bucket['区间']} (区块 {bucket['开始区块']} 到 {bucket['结束区块']}): {bucket['事件数']}{incomplete}\n")
+        self.master.after(0, self.show_histogram, histogram)
+
+        # 停止统计，但不退出 UI
+        self.stop_monitoring_thread()
+
+    def show_histogram(self, histogram):
+        if not histogram:
+            return
+        window = tk.Toplevel(self.master)
+        window.title(f"{self.event_name_entry.get()} 事件分布")
+        width, height, margin = 800, 400, 50
+        canvas = tk.Canvas(window, width=width, height=height, bg="white")
+        canvas.pack(fill=tk.BOTH, expand=True)
+
+        max_count = max(bucket["事件数"] for bucket in histogram) or 1
+        bar_width = (width - 2 * margin) / len(histogram)
+        canvas.create_line(margin, height - margin, width - margin, height - margin)
+        canvas.create_line(margin, margin, margin, height - margin)
+        canvas.create_text(margin - 5, margin, text=str(max_count), anchor=tk.E)
+        canvas.create_text(margin - 5, height - margin, text="0", anchor=tk.E)
+
+        # 分组较多时只标注部分区间，避免文字重叠
+        label_step = max(1, len(histogram) // 8)
+        for index, bucket in enumerate(histogram):
+            x0 = margin + index * bar_width
+            y0 = height - margin - (height - 2 * margin) * bucket["事件数"] / max_count
+            # 统计不完整的分组用红色标出
+            color = "red" if bucket["错误"] else "steelblue"
+            canvas.create_rectangle(x0 + 1, y0, x0 + bar_width - 1, height - margin, fill=color, outline="")
+            if bucket["错误"]:
+                canvas.create_text(x0 + bar_width / 2, y0 - 2, text="!", fill="red", anchor=tk.S)
+            if index % label_step == 0:
+                canvas.create_text(x0, height - margin + 5, text=bucket["区间"], anchor=tk.NW, font=("TkDefaultFont", 8))
 
     def stop_monitoring_thread(self):
         self.stop_monitoring.set()
         self.start_button.config(state="normal")
+        self.histogram_button.config(state="normal")
         self.stop_button.config(state="disabled")
         self.save_button.config(state="normal")
         self.output_queue.put("监听已停止\n")
@@ -0,0 +1,245 @@
+from typing import List, Dict, Any, Optional, Iterator, Tuple
+import json
+import mmap
+import os
+import struct
+from threading import Lock
+from hexbytes import HexBytes
+from web3 import Web3
+
+# 段文件达到该大小后切换到新的段文件
+SEGMENT_MAX_BYTES = 64 * 1024 * 1024
+INDEX_FILE = "index.json"
+
+# 记录头：记录总长度、区块号、日志索引、交易索引、区块时间戳、合约地址、交易哈希、区块哈希、
+# 交易发送者、交易接收者、是否有接收者、topic 数量；其后依次为 32 字节的 topics 和日志 data
+RECORD_HEADER = struct.Struct('<IQIIQ20s32s32s20s20sBB')
+TOPIC_SIZE = 32
+
+
+def _address_bytes(address: Optional[str]) -> bytes:
+    if not address:
+        return b'\x00' * 20
+    return bytes(HexBytes(address))
+
+
+def encode_record(log: Dict, context: Dict[str, Any]) -> bytes:
+    """将原始日志及其补充信息（交易 from/to、区块时间戳）编码为一条紧凑的二进制记录。"""
+    topics = b''.join(bytes(HexBytes(topic)) for topic in log['topics'])
+    data = bytes(HexBytes(log['data']))
+    record_len = RECORD_HEADER.size + len(topics) + len(data)
+    header = RECORD_HEADER.pack(
+        record_len,
+        log['blockNumber'],
+        log['logIndex'],
+        log['transactionIndex'],
+        int(context['timestamp']),
+        _address_bytes(log['address']),
+        bytes(HexBytes(log['transactionHash'])),
+        bytes(HexBytes(log['blockHash'])),
+        _address_bytes(context['from']),
+        _address_bytes(context['to']),
+        1 if context['to'] else 0,
+        len(log['topics'])
+    )
+    return header + topics + data
+
+
+def decode_record(buffer: Any, offset: int, raw: bool = False) -> Tuple[Dict[str, Any], Dict[str, Any], int]:
+    """
+    从 buffer 的 offset 处解码一条记录，返回 (日志, 补充信息, 下一条记录的偏移)。
+    raw 为 True 时地址、哈希、topics 和 data 均保留为 bytes，省去校验和地址计算等开销。
+    """
+    (record_len, block_number, log_index, tx_index, timestamp, address, tx_hash,
+     block_hash, sender, receiver, has_to, topic_count) = RECORD_HEADER.unpack_from(buffer, offset)
+    topics_start = offset + RECORD_HEADER.size
+    data_start = topics_start + topic_count * TOPIC_SIZE
+    if raw:
+        log = {
+            'address': address,
+            'topics': [buffer[topics_start + i * TOPIC_SIZE:topics_start + (i + 1) * TOPIC_SIZE]
+                       for i in range(topic_count)],
+            'data': buffer[data_start:offset + record_len],
+            'blockNumber': block_number,
+            'logIndex': log_index,
+            'transactionIndex': tx_index,
+            'transactionHash': tx_hash,
+            'blockHash': block_hash
+        }
+        context = {'from': sender, 'to': receiver if has_to else None, 'timestamp': timestamp}
+        return log, context, offset + record_len
+    log = {
+        'address': Web3.to_checksum_address(address),
+        'topics': [HexBytes(buffer[topics_start + i * TOPIC_SIZE:topics_start + (i + 1) * TOPIC_SIZE])
+                   for i in range(topic_count)],
+        'data': HexBytes(buffer[data_start:offset + record_len]),
+        'blockNumber': block_number,
+        'logIndex': log_index,
+        'transactionIndex': tx_index,
+        'transactionHash': HexBytes(tx_hash),
+        'blockHash': HexBytes(block_hash)
+    }
+    context = {
+        'from': Web3.to_checksum_address(sender),
+        'to': Web3.to_checksum_address(receiver) if has_to else None,
+        'timestamp': timestamp
+    }
+    return log, context, offset + record_len
+
+
+class LogArchive:
+    """
+    只追加的原始日志归档。日志按写入顺序存放在段文件中，index.json 记录每个段文件的
+    区块范围、时间戳范围、合约地址和已落盘的字节数，回放时只映射与查询范围重叠的段文件。
+    """
+
+    def __init__(self, directory: str, segment_max_bytes: int = SEGMENT_MAX_BYTES):
+        self.directory = directory
+        self.segment_max_bytes = segment_max_bytes
+        self.index_path = os.path.join(directory, INDEX_FILE)
+        self.lock = Lock()
+        self.current_file = None
+        os.makedirs(directory, exist_ok=True)
+        self.segments = self.load_index()
+
+    def load_index(self) -> List[Dict[str, Any]]:
+        if not os.path.exists(self.index_path):
+            return []
+        with open(self.index_path, 'r') as f:
+            segments = json.load(f)
+        # 丢弃上次异常退出时未写入索引的残缺尾部数据
+        for segment in segments:
+            path = os.path.join(self.directory, segment['file'])
+            if os.path.exists(path) and os.path.getsize(path) > segment['size']:
+                with open(path, 'r+b') as f:
+                    f.truncate(segment['size'])
+        return segments
+
+    def save_index(self):
+        tmp_path = self.index_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(self.segments, f)
+        os.replace(tmp_path, self.index_path)
+
+    def open_segment(self, first_block: int):
+        segment = {
+            'file': f"segment_{len(self.segments):06d}_{first_block}.seg",
+            'first_block': first_block,
+            'last_block': first_block,
+            'first_timestamp': None,
+            'last_timestamp': None,
+            'count': 0,
+            'size': 0,
+            'addresses': []
+        }
+        self.segments.append(segment)
+        # 新段文件以覆盖方式打开：同名文件只可能是上次未写入索引就退出时遗留的数据
+        self.current_file = open(os.path.join(self.directory, segment['file']), 'wb')
+
+    def append(self, log: Dict, context: Dict[str, Any]):
+        """追加一条原始日志及其补充信息，可在多个线程中同时调用。"""
+        record = encode_record(log, context)
+        block_number = log['blockNumber']
+        timestamp = int(context['timestamp'])
+        address = Web3.to_checksum_address(log['address'])
+        with self.lock:
+            if self.current_file is None:
+                if self.segments and self.segments[-1]['size'] + len(record) <= self.segment_max_bytes:
+                    self.current_file = open(os.path.join(self.directory, self.segments[-1]['file']), 'ab')
+                else:
+                    self.open_segment(block_number)
+            elif self.segments[-1]['size'] + len(record) > self.segment_max_bytes:
+                self.current_file.close()
+                self.open_segment(block_number)
+
+            self.current_file.write(record)
+            segment = self.segments[-1]
+            segment['first_block'] = min(segment['first_block'], block_number)
+            segment['last_block'] = max(segment['last_block'], block_number)
+            if segment['first_timestamp'] is None:
+                segment['first_timestamp'] = segment['last_timestamp'] = timestamp
+            segment['first_timestamp'] = min(segment['first_timestamp'], timestamp)
+            segment['last_timestamp'] = max(segment['last_timestamp'], timestamp)
+            segment['count'] += 1
+            segment['size'] += len(record)
+            if address not in segment['addresses']:
+                segment['addresses'].append(address)
+
+    def flush(self):
+        """将已追加的数据落盘并更新索引。"""
+        with self.lock:
+            if self.current_file is not None:
+                self.current_file.flush()
+                os.fsync(self.current_file.fileno())
+            self.save_index()
+
+    def close(self):
+        self.flush()
+        with self.lock:
+            if self.current_file is not None:
+                self.current_file.close()
+                self.current_file = None
+
+    def addresses(self) -> set:
+        """返回归档中出现过的全部合约地址。"""
+        with self.lock:
+            return {address for segment in self.segments for address in segment.get('addresses', [])}
+
+    def iter_records(
+        self,
+        start_block: int = 0,
+        end_block: int = 0,
+        start_timestamp: Optional[int] = None,
+        end_timestamp: Optional[int] = None,
+        address: Optional[str] = None,
+        topic0: Optional[bytes] = None,
+        raw: bool = False
+    ) -> Iterator[Tuple[Dict[str, Any], Dict[str, Any]]]:
+        """
+        以内存映射方式读取范围内的记录，按写入顺序逐条产出 (日志, 补充信息)。
+        end_block 为 0 表示不限制结束区块；address 和 topic0 直接在原始字节上比较，
+        不匹配的记录不会被解码；重复归档的日志只产出一次。raw 的含义同 decode_record。
+        """
+        with self.lock:
+            segments = [dict(segment) for segment in self.segments]
+        end_block = end_block or float('inf')
+        address_bytes = _address_bytes(address) if address else None
+        topic0_bytes = bytes(HexBytes(topic0)) if topic0 is not None else None
+
+        seen = set()
+        for segment in segments:
+            if segment['count'] == 0 or segment['last_block'] < start_block or segment['first_block'] > end_block:
+                continue
+            if start_timestamp is not None and segment['last_timestamp'] < start_timestamp:
+                continue
+            if end_timestamp is not None and segment['first_timestamp'] > end_timestamp:
+                continue
+
+            with open(os.path.join(self.directory, segment['file']), 'rb') as f:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    offset = 0
+                    while offset < segment['size']:
+                        (record_len, block_number, log_index, _, timestamp, record_address,
+                         *_, topic_count) = RECORD_HEADER.unpack_from(mm, offset)
+                        record_offset = offset
+                        offset += record_len
+
+                        if not start_block <= block_number <= end_block:
+                            continue
+                        if start_timestamp is not None and timestamp < start_timestamp:
+                            continue
+                        if end_timestamp is not None and timestamp > end_timestamp:
+                            continue
+                        if address_bytes is not None and record_address != address_bytes:
+                            continue
+                        if topic0_bytes is not None:
+                            topic_start = record_offset + RECORD_HEADER.size
+                            if topic_count == 0 or mm[topic_start:topic_start + TOPIC_SIZE] != topic0_bytes:
+                                continue
+                        key = (block_number, log_index)
+                        if key in seen:
+                            continue
+                        seen.add(key)
+
+                        log, context, _ = decode_record(mm, record_offset, raw)
+                        yield log, context